@@ -1,4 +1,5 @@
 from PIL import Image
+import math
 import numpy as np
 from typing import List, Optional
 from enum import Enum
@@ -25,11 +26,10 @@ class ShapeConverter:
 
     # convert an index [0:N) to coords (col, row)
     def index_to_coords(self, ptindex): 
-        if (ptindex < 0) | (ptindex >= self.N):
+        if ptindex < 0 or ptindex >= self.N:
             raise Exception("index out of range")
-        row = np.floor(ptindex/self.WIDTH)
-        col = ptindex - row * self.WIDTH
-        return (int(col), int(row))  
+        row, col = divmod(int(ptindex), self.WIDTH)
+        return (col, row)
 
 
     # convert coords (col, row) to index [0:N)
@@ -37,9 +37,9 @@ class ShapeConverter:
         col = coords[0]
         row = coords[1]
 
-        if (col < 0) | (col >= self.WIDTH):
+        if col < 0 or col >= self.WIDTH:
             raise Exception("column coordinate out of range")
-        if (row < 0) | (row >= self.HEIGHT):
+        if row < 0 or row >= self.HEIGHT:
             raise Exception("row coordinate out of range")
 
         return int((row * self.WIDTH) + col)
@@ -50,22 +50,74 @@ class ShapeConverter:
 #
 
 class ColorClass:
-    def __init__(self, rgb: tuple):
-        self.rgb = rgb
-        self.rgbvec = np.array(self.rgb)
-
-    def get_distance(self, color):
-        delta = self.rgbvec - color.rgbvec
-        return np.sqrt(np.sum(delta*delta))
+    # rgb is an (r, g, b) tuple, or a uint8 array of length 3.
+    # A uint8 array is kept as is (not copied), so the color can be a view into a larger palette array.
+    def __init__(self, rgb):
+        if isinstance(rgb, np.ndarray) and rgb.dtype == np.uint8:
+            self.rgbvec = rgb
+        else:
+            self.rgbvec = np.array(rgb, dtype=np.uint8)
+
+    # build a list of ColorClass objects backed by the rows of an (N, 3) palette array
+    @classmethod
+    def from_array(cls, palette: np.ndarray) -> List["ColorClass"]:
+        palette = np.ascontiguousarray(palette, dtype=np.uint8)
+        return [cls(row) for row in palette]
+
+    @property
+    def rgb(self) -> tuple:
+        return tuple(self.rgbvec.tolist())
+
+    # squared distance to another color. Colors are only ever compared by distance,
+    # and sqrt doesn't change the order, so there's no need to take it.
+    def get_sqdistance(self, color):
+        delta = self.rgbvec.astype(np.int32) - color.rgbvec
+        return np.dot(delta, delta)
     
 
+# make a colorlist from a list of rgb tuples (for example, from Image.getdata()).
+# All the colors share one (N, 3) uint8 array.
+def make_colorlist(colors) -> List[ColorClass]:
+    return ColorClass.from_array(np.array(colors, dtype=np.uint8).reshape(-1, 3))
+
+
+
+# the 32768 15-bit colors, as a (32768, 3) uint8 palette array
+def palette_15bit() -> np.ndarray:
+    return np.mgrid[0:32, 0:32, 0:32].reshape(3, -1).T.astype(np.uint8) * 8
+
+
+# convert a colorlist (ColorClass objects or rgb tuples) to an (N, 3) uint8 palette array
+def to_palette(colorlist) -> np.ndarray:
+    if isinstance(colorlist, np.ndarray):
+        return colorlist.astype(np.uint8, copy=False)
+    return np.array([c.rgbvec if isinstance(c, ColorClass) else c for c in colorlist], dtype=np.uint8).reshape(-1, 3)
+
 
-# sort a colorlist in ascending distance from refcolor
-def sort_colorlist(colorlist: List[ColorClass], refcolor: ColorClass) -> List[ColorClass]:
-    distancelist = [c.get_distance(refcolor) for c in colorlist]
-    # sort colorlist based on distance
-    indices = np.argsort(distancelist)
-    return [colorlist[i] for i in indices]
+# pack an (N, 3) uint8 array of rgb colors into (N,) uint32 values 0x00RRGGBB
+def pack_rgb(colors: np.ndarray) -> np.ndarray:
+    colors = colors.astype(np.uint32)
+    return (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+
+# unpack (N,) uint32 values 0x00RRGGBB into an (N, 3) uint8 array of rgb colors
+def unpack_rgb(packed: np.ndarray) -> np.ndarray:
+    return np.stack([packed >> 16, packed >> 8, packed], axis=1).astype(np.uint8)
+
+
+# squared color distances from each row of colors (shape (N, 3)) to refcolor
+def sq_distances(colors: np.ndarray, refcolor) -> np.ndarray:
+    delta = colors.astype(np.int32) - np.asarray(refcolor, dtype=np.int32)
+    return np.einsum('ij,ij->i', delta, delta)
+
+
+# sort a palette in ascending distance from refcolor
+# (sqrt is monotonic, so sorting by squared distance gives the same order)
+def sort_colorlist(palette: np.ndarray, refcolor) -> np.ndarray:
+    distancelist = sq_distances(palette, refcolor)
+    # sort palette based on distance; stable, so duplicate colors keep their order
+    indices = np.argsort(distancelist, kind='stable')
+    return palette[indices]
 
     
 
@@ -78,100 +130,123 @@ class NBRHOOD(Enum):
     CROSS = 2        # up/down/left/right only
 
 
+# neighbor offsets (dx, dy) for each neighborhood type, in the order the neighbors are listed
+NBR_OFFSETS = {
+    NBRHOOD.ALL: [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)],
+    NBRHOOD.CROSS: [(-1, 0), (1, 0), (0, -1), (0, 1)],
+}
+
+
+# build the (N, K) table of neighbor indices; out-of-bounds neighbors are marked with -1
+def build_nbr_table(converter: ShapeConverter, nbrhood_type:NBRHOOD = NBRHOOD.ALL) -> np.ndarray:
+    if nbrhood_type not in NBR_OFFSETS:
+        raise Exception("Unrecognized neighborhood type.")
+    W = converter.WIDTH
+    H = converter.HEIGHT
+    # cols, rows are (H, W), so they flatten in point index order
+    cols, rows = np.meshgrid(np.arange(W), np.arange(H))
+    nbrs = []
+    for dx, dy in NBR_OFFSETS[nbrhood_type]:
+        nc = cols + dx
+        nr = rows + dy
+        valid = (nc >= 0) & (nc < W) & (nr >= 0) & (nr < H)
+        nbrs.append(np.where(valid, nr * W + nc, -1).ravel())
+    return np.stack(nbrs, axis=1).astype(np.int32)
+
+
+# a lightweight view of one point in a PointArray
 class Point:
-    def __init__(self, index:int, converter: ShapeConverter, nbrhood_type:NBRHOOD):
+    def __init__(self, index:int, ptarray):
         self.index = index
-        self.converter = converter
-        self.coords = converter.index_to_coords(index)  # tuple
-        self.nbrs = self.get_nbrs(nbrhood_type)   # list of indices (not Points)
-        self.color = None   # ColorClass
-
+        self.ptarray = ptarray
+
+    @property
+    def coords(self):
+        return self.ptarray.converter.index_to_coords(self.index)
+
+    # my neighbors, represented as indices (not points)
+    @property
+    def nbrs(self) -> np.ndarray:
+        row = self.ptarray.nbr_table[self.index]
+        return row[row >= 0]
+
+    @property
+    def color(self):
+        if not self.ptarray.filled[self.index]:
+            return None
+        return ColorClass(self.get_color())
+
+    @color.setter
+    def color(self, color):
+        if color is None:
+            self.ptarray.clear_color(self.index)
+        else:
+            self.ptarray.set_color(self.index, color.rgb)
 
     def get_color(self):
-        if self.color is None:
-            return (0, 0, 0)
-        return self.color.rgb
-    
+        return tuple(int(v) for v in self.ptarray.colors[self.index])
 
-    # find my neighbors, represented as indices (not points)
-    def get_nbrs(self, nbrhood_type:NBRHOOD = NBRHOOD.ALL) -> List[int] :
-        x, y = self.coords
-        n = 1
-        xrange = range(max(x-n, 0), min(x+n+1, self.converter.WIDTH))
-        yrange = range(max(y-n, 0), min(y+n+1, self.converter.HEIGHT))
-
-        nbrs = []
-
-        if nbrhood_type == NBRHOOD.ALL:
-            for xi in xrange:
-                for yi in yrange:
-                    pix = self.converter.coords_to_index((xi, yi))
-                    if pix != self.index:
-                        nbrs.append(pix)
-            return nbrs
-        
-        if nbrhood_type == NBRHOOD.CROSS:
-            # left and right nbrs
-            for xi in xrange:
-                pix = self.converter.coords_to_index((xi, y))
-                if pix != self.index:
-                    nbrs.append(pix)
-            # up and down nbrs
-            for yi in yrange:
-                pix = self.converter.coords_to_index((x, yi))
-                if pix != self.index:
-                    nbrs.append(pix)
-                    
-            return nbrs
-        
-        raise Exception("Unrecognized neighborhood type.")
-    
 
 
 #
 # An array of Points, the same size as the input image
 # Assume for now that the image mode is RGB
 #
+# The points are stored as a struct of arrays:
+#   colors: (N, 3) uint8 array of the point colors (black if unfilled)
+#   filled: (N,) boolean array, True if the point has been assigned a color
+#   nbr_table: (N, K) int32 array of neighbor indices, -1 if the neighbor is off the grid
+#
 
 class PointArray:
 
     # named arguments required
     def __init__(self, *, nbrhood_type: NBRHOOD, image:Optional[Image] = None):
-        if image is None:
-            self.converter = ShapeConverter()
-            self.pointlist = [None] * self.converter.N
-            for i in range(self.converter.N):
-                self.pointlist[i] = Point(i, self.converter, nbrhood_type)
-        else:
-            self.converter = ShapeConverter(image)
-            self.pointlist = [None] * self.converter.N
-            for i in range(self.converter.N):
-                self.pointlist[i] = Point(i, self.converter, nbrhood_type)
+        self.converter = ShapeConverter(image)
+        N = self.converter.N
+        self.colors = np.zeros((N, 3), dtype=np.uint8)
+        self.filled = np.zeros(N, dtype=bool)
+        self.nbr_table = build_nbr_table(self.converter, nbrhood_type)
 
 
     def aspoint(self, index):
-        return self.pointlist[index]
-
-
-    # calculate the nbr_distance of <o> from its neighbors, if <o>.color == <color>
-    # the nbr_distance is the minimum color distance from the filled neighbors
-    def nbr_distance(self, o:int, color:ColorClass):
-        # get all the neighboring colors
-        nbrcolors = [self.aspoint(n).color for n in self.aspoint(o).nbrs if self.aspoint(n).color is not None]
-        distances = [nc.get_distance(color) for nc in nbrcolors]
-        return min(distances)
+        return Point(index, self)
+
+
+    def set_color(self, index:int, rgb):
+        self.colors[index] = rgb
+        self.filled[index] = True
+
+
+    def clear_color(self, index:int):
+        self.colors[index] = 0
+        self.filled[index] = False
+
+
+    # calculate the nbr_distance of <o> from its neighbors, if <o>.color == <color> (an rgb triple)
+    # the nbr_distance is the minimum squared color distance from the filled neighbors
+    # (only up to K neighbors, so a plain loop over local names beats the numpy call overhead)
+    def nbr_distance(self, o:int, color):
+        filled = self.filled
+        colors = self.colors
+        r, g, b = (int(v) for v in color)
+        mindist = math.inf
+        for n in self.nbr_table[o].tolist():
+            if n >= 0 and filled[n]:
+                nr, ng, nb = colors[n].tolist()
+                d = (nr - r)*(nr - r) + (ng - g)*(ng - g) + (nb - b)*(nb - b)
+                if d < mindist:
+                    mindist = d
+        return mindist
     
 
     # create an image from this PointArray
     def create_image(self, width=None, height=None) -> Image:
-        image = Image.new("RGB", (self.converter.WIDTH, self.converter.HEIGHT))
-        pixels = [p.get_color() for p in self.pointlist]
-        image.putdata(pixels)
+        # unfilled points are black, since colors starts out as zeros
+        image = Image.frombytes("RGB", (self.converter.WIDTH, self.converter.HEIGHT), self.colors.tobytes())
         if width==None:
             width=self.converter.WIDTH
         if height==None:
             height=self.converter.HEIGHT
 
         return image.resize((width, height), resample=Image.Resampling.NEAREST)
-    
-
@@ -9,7 +9,8 @@ Any duplicate colors in the list are kept; the generated image will have colors
 
 My solution is similar to [this submission](https://codegolf.stackexchange.com/a/22326) by user fejesjoco, though it's not the same.
 I pick a initial pixel and color (possibly by random), then place each subsequent color such that it's nearest to the colors of its filled neighbors. 
-The "neighbor distance" metric is the minimum distance from my filled neighbors.
+The "neighbor distance" metric is the minimum distance from my filled neighbors. 
+(I compare squared distances, which puts the colors in the same order without the sqrt.)
 
 I cheat a bit; the generated image will be the same size as its source (256 x 128 in the 15-bit color case), then I resize to the desired size using Image.resize(), 
 with Image.Resampling.NEAREST to upsample while preserving the original list of colors. Using the default resampling filter (BICUBIC) produces lovely smoothed images, 
@@ -19,11 +20,156 @@ but obscures the properties of the original algorithm.
 
 from PIL import Image
 import numpy as np
+from numba import njit, prange
 from typing import List, Optional
 from generators.genutils import *
 
 
-def _generate(colorlist: List[ColorClass], ptarray: PointArray, seed_point:int=None, width:int=None, height:int=None, rng:np.random.default_rng=None) -> Image:
+# larger than any squared distance between two rgb colors
+MAX_SQDIST = 3 * 255 * 255 + 1
+
+
+# Boundaries at least this big are scanned in parallel (see _best_slot_parallel()).
+# Smaller scans take only a few microseconds, less than it costs to start the threads.
+PARALLEL_MIN_BOUNDARY = 2048
+
+# marks an empty slot (off-grid or unfilled neighbor) in the boundary neighbor colors
+EMPTY = np.uint32(0xFFFFFFFF)
+
+
+#
+# The boundary is kept in an array, in temporal order of insertion: boundary[:nb].
+# on_boundary marks which points are currently on it, so membership is a single lookup,
+# and pos gives each boundary point's position in the array.
+# nbr_colors[i] holds the packed colors of boundary[i]'s K neighbors (EMPTY if not filled), 
+# so the search reads the boundary's neighbor colors sequentially instead of gathering 
+# them from all over the image.
+#
+
+# add the unfilled neighbors of p that aren't already on the boundary.
+# Returns the new size of the boundary.
+@njit(cache=True)
+def _add_to_boundary(p, nbr_table, colors, filled, on_boundary, pos, boundary, nbr_colors, nb):
+    K = nbr_table.shape[1]
+    for k in range(K):
+        n = nbr_table[p, k]
+        if n >= 0 and not filled[n] and not on_boundary[n]:
+            boundary[nb] = n
+            pos[n] = nb
+            on_boundary[n] = True
+            for j in range(K):
+                m = nbr_table[n, j]
+                if m >= 0 and filled[m]:
+                    nbr_colors[nb, j] = colors[m]
+                else:
+                    nbr_colors[nb, j] = EMPTY
+            nb += 1
+    return nb
+
+
+#
+# Find the boundary point whose filled neighbors are nearest to the packed color c.
+# Scans the (boundary point, neighbor) pairs in order and keeps the first strict minimum,
+# so ties go to the earliest point on the boundary. An exact match can't be beaten,
+# so the scan stops there.
+# Returns the position of the point in boundary[:nb].
+#
+@njit(cache=True)
+def _best_slot(c, nbr_colors, nb):
+    K = nbr_colors.shape[1]
+    r = np.int32(c >> 16)
+    g = np.int32((c >> 8) & 0xFF)
+    b = np.int32(c & 0xFF)
+
+    mindist = MAX_SQDIST
+    besti = -1
+    for i in range(nb):
+        for k in range(K):
+            nc = nbr_colors[i, k]
+            if nc != EMPTY:
+                dr = np.int32(nc >> 16) - r
+                dg = np.int32((nc >> 8) & 0xFF) - g
+                db = np.int32(nc & 0xFF) - b
+                d = dr*dr + dg*dg + db*db
+                if d < mindist:
+                    mindist = d
+                    besti = i
+        if mindist == 0:
+            break
+    return besti
+
+
+#
+# The same search as _best_slot(), with the boundary points split across threads.
+# Each thread finds the per-point minimum distances for its points, in pmin[:nb];
+# argmin then takes the first minimum, so ties go to the same point as in the serial scan.
+#
+@njit(parallel=True, cache=True)
+def _best_slot_parallel(c, nbr_colors, nb, pmin):
+    K = nbr_colors.shape[1]
+    r = np.int32(c >> 16)
+    g = np.int32((c >> 8) & 0xFF)
+    b = np.int32(c & 0xFF)
+
+    for i in prange(nb):
+        mindist = MAX_SQDIST
+        for k in range(K):
+            nc = nbr_colors[i, k]
+            if nc != EMPTY:
+                dr = np.int32(nc >> 16) - r
+                dg = np.int32((nc >> 8) & 0xFF) - g
+                db = np.int32(nc & 0xFF) - b
+                d = dr*dr + dg*dg + db*db
+                if d < mindist:
+                    mindist = d
+        pmin[i] = mindist
+    return np.argmin(pmin[:nb])
+
+
+#
+# Place the colors palette[start:], in order. Each color goes to the boundary point
+# whose filled neighbors are nearest to it (see _best_slot()).
+# palette and colors hold packed 0x00RRGGBB colors (see pack_rgb()), so each neighbor
+# color is a single 32-bit load.
+# colors, filled, and the boundary arrays are updated in place.
+# Returns the final size of the boundary.
+#
+@njit(cache=True)
+def _fill_nearcolors(palette, start, nbr_table, colors, filled, on_boundary, pos, boundary, nbr_colors, nb):
+    K = nbr_table.shape[1]
+    pmin = np.empty(boundary.shape[0], dtype=np.int32)  # scratch space for the parallel scan
+    for c in range(start, palette.shape[0]):
+        # find the best place to put this color
+        if nb >= PARALLEL_MIN_BOUNDARY:
+            besti = _best_slot_parallel(palette[c], nbr_colors, nb, pmin)
+        else:
+            besti = _best_slot(palette[c], nbr_colors, nb)
+        best = boundary[besti]
+        colors[best] = palette[c]
+        filled[best] = True
+
+        # take the point off the boundary, keeping the rest in order
+        for i in range(besti, nb - 1):
+            boundary[i] = boundary[i + 1]
+            nbr_colors[i] = nbr_colors[i + 1]
+            pos[boundary[i]] = i
+        nb -= 1
+        on_boundary[best] = False
+
+        # best is now a filled neighbor of the boundary points around it
+        for k in range(K):
+            n = nbr_table[best, k]
+            if n >= 0 and on_boundary[n]:
+                for j in range(K):
+                    if nbr_table[n, j] == best:
+                        nbr_colors[pos[n], j] = palette[c]
+
+        # add the new neighbors to the boundary
+        nb = _add_to_boundary(best, nbr_table, colors, filled, on_boundary, pos, boundary, nbr_colors, nb)
+    return nb
+
+
+def _generate(colorlist: np.ndarray, ptarray: PointArray, seed_point:int=None, width:int=None, height:int=None, rng:np.random.default_rng=None) -> Image:
     N = ptarray.converter.N
 
     if rng is None:
@@ -36,56 +182,39 @@ def _generate(colorlist: List[ColorClass], ptarray: PointArray, seed_point:int=N
         p0 = seed_point
 
     # shuffle the colorlist, and take the first color as the initial color
-    colorlist = list(rng.permutation(colorlist))
-    c0 = colorlist.pop(0)
-    ptarray.aspoint(p0).color = c0
+    palette = rng.permutation(to_palette(colorlist))
+    c0 = palette[0]
+    ptarray.set_color(p0, c0)
 
     # re-sort the colorlist according to c0
-    colorlist = sort_colorlist(colorlist, c0)
+    palette = sort_colorlist(palette[1:], c0)
 
     # fill the boundary with the closest colors
-    boundary_0 = ptarray.aspoint(p0).nbrs  # list of indices
-    for b in boundary_0:
-        ptarray.aspoint(b).color = colorlist.pop(0)
+    boundary_0 = ptarray.aspoint(p0).nbrs  # array of indices
+    for i, b in enumerate(boundary_0):
+        ptarray.set_color(b, palette[i])
 
-    # get the new boundary
-    filled = set(boundary_0 + [p0])
-    boundary_set = set()
-    for f in filled:
-        boundary_set.update(ptarray.aspoint(f).nbrs)
-    boundary_list = list(boundary_set.difference(filled))
-    boundary_set = set(boundary_list)
-
-    while len(colorlist) > 0:
-        # get the next color
-        color = colorlist.pop(0)
-        
-        # find the best place to put this color
-        mindist = np.Infinity
-        best = None
-        for b in boundary_list:
-            d = ptarray.nbr_distance(b, color)
-            if d < mindist:
-                mindist = d
-                best = b
-        assert(best is not None)
-        assert(ptarray.aspoint(best).color is None)
-        ptarray.aspoint(best).color = color
-
-        # move the point to the filled list
-        filled.add(best)
-        # add the new neighbors to the boundary
-        boundary_set.update(ptarray.aspoint(best).nbrs)
-        boundary_set = boundary_set.difference(filled)
+    # the boundary (see _add_to_boundary()), working on packed colors
+    packed = pack_rgb(ptarray.colors)
+    K = ptarray.nbr_table.shape[1]
+    boundary = np.zeros(N, dtype=np.int32)
+    pos = np.zeros(N, dtype=np.int32)
+    nbr_colors = np.zeros((N, K), dtype=np.uint32)
+    on_boundary = np.zeros(N, dtype=bool)
+    nb = 0  # current size of the boundary
 
-        # Doing it this way so I traverse the boundary roughly in temporal order of insertion; a set won't preserve that.
-        boundary_list = [b for b in boundary_list if b in boundary_set] + [b for b in boundary_set if b not in set(boundary_list)]
+    # get the new boundary
+    for p in [p0] + boundary_0.tolist():
+        nb = _add_to_boundary(p, ptarray.nbr_table, packed, ptarray.filled, on_boundary, pos, boundary, nbr_colors, nb)
 
-        assert(len(filled) == (N - len(colorlist)) )
+    # place the rest of the colors
+    nb = _fill_nearcolors(pack_rgb(palette), len(boundary_0), ptarray.nbr_table, packed, 
+                          ptarray.filled, on_boundary, pos, boundary, nbr_colors, nb)
+    assert(nb == 0)
+    ptarray.colors[:] = unpack_rgb(packed)
 
-    # let's make sure that we didn't miss any spots 
-    blanks = [p for p in ptarray.pointlist if p.color is None]
-    assert(len(blanks)==0)
+    # let's make sure that we didn't miss any spots (like the other asserts, skipped under python -O)
+    assert(ptarray.filled.all())
     
     return ptarray.create_image(width, height)
 
@@ -109,25 +238,19 @@ def nearcolors_image(imgfile:str = None, seed_point:int=None, width:int=None, he
     PIL.Image: the generated image
     """
     if imgfile is None:
-        # initialize the colorlist, which is a list of ColorClass objects
-        colorlist = []
-        for r in range(0, 32):
-            for g in range(0, 32):
-                for b in range(0, 32):
-                    color = (r * 8, g * 8, b * 8)
-                    colorlist.append(ColorClass(color))
+        # initialize the colorlist, which is an (N, 3) array of the 15-bit colors
+        colorlist = palette_15bit()
 
         # initialize the point array
-            ptarray = PointArray(nbrhood_type=NBRHOOD.ALL)
+        ptarray = PointArray(nbrhood_type=NBRHOOD.ALL)
     else:
         # get the source image
         image = Image.open(imgfile)
         N = image.size[0] * image.size[1]
 
-        # initialize the colorlist, which is a list of ColorClass objects
-        colors = list(image.getdata())
-        assert(len(colors) == N)
-        colorlist = [ColorClass(c) for c in colors]
+        # initialize the colorlist, which is an (N, 3) array of the image colors
+        colorlist = np.asarray(image.convert("RGB")).reshape(-1, 3)
+        assert(len(colorlist) == N)
 
         # initialize the point array
         ptarray = PointArray(image=image, nbrhood_type=NBRHOOD.ALL)
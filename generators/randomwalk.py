@@ -23,54 +23,60 @@ from typing import List, Optional
 from generators.genutils import *
 
 
-def _generate(colorlist: List[ColorClass], ptarray: PointArray, seed_point:int=None, width:int=None, height:int=None, rng:np.random.default_rng=None) -> Image:
+def _generate(colorlist: np.ndarray, ptarray: PointArray, seed_point:int=None, width:int=None, height:int=None, rng:np.random.default_rng=None) -> Image:
     N = ptarray.converter.N
-    unfilled = set([i for i in range(N)])
-    filled = set()
+    unfilled_count = N
 
     if rng is None:
         rng = np.random.default_rng()
     if seed_point is None:
         # pick a random start point
-        p0 = rng.choice(list(unfilled))
+        p0 = rng.integers(0, N)
     else:
         p0 = seed_point
 
     # pick a random start color, then resort the color list to that color
-    c0 = rng.choice(colorlist)
-    colorlist = sort_colorlist(colorlist, c0) # this should put c0 at the top
-    assert(c0 == colorlist[0])
+    palette = to_palette(colorlist)
+    c0 = palette[rng.integers(0, len(palette))]
+    palette = sort_colorlist(palette, c0) # this should put c0 at the top
+    assert(np.array_equal(c0, palette[0]))
+
+    # the colors still to be placed are palette[cursor:]
+    cursor = 0
 
     # assign c0 to p0
-    ptarray.aspoint(p0).color = colorlist.pop(0)
-    filled.add(p0)
-    unfilled.remove(p0)
+    ptarray.set_color(p0, palette[cursor])
+    cursor += 1
+    unfilled_count -= 1
 
 
     # pick a random neighbor from my point, and put in the next nearest color
-    while len(colorlist) > 0:
-        choices = set(ptarray.aspoint(p0).nbrs).difference(filled)
+    nbr_table = ptarray.nbr_table
+    filled = ptarray.filled
+    while cursor < len(palette):
+        nbrs = nbr_table[p0]
+        choices = nbrs[(nbrs >= 0) & ~filled[nbrs]]
         if len(choices) > 0:
             # go to a random unfilled neighbor, if there is one
-            pnext = rng.choice(list(choices))
-            ptarray.aspoint(pnext).color = colorlist.pop(0)
-            filled.add(pnext)
-            unfilled.remove(pnext)
+            pnext = choices[rng.integers(0, len(choices))]
+            ptarray.set_color(pnext, palette[cursor])
             p0 = pnext
         else:
-            # pick a new random start and color
-            p0 = rng.choice(list(unfilled))
-            c0 = rng.choice(colorlist)
-            colorlist = sort_colorlist(colorlist, c0)
-            ptarray.aspoint(p0).color = colorlist.pop(0)
-            filled.add(p0)
-            unfilled.remove(p0)
-
-        assert(len(unfilled) == len(colorlist))
-
-    # let's make sure that we didn't miss any spots 
-    blanks = [p for p in ptarray.pointlist if p.color is None]
-    assert(len(blanks)==0)
+            # pick a new random start and color.
+            # Dead ends are rare, so it's ok to scan for the unfilled points here.
+            p0 = np.flatnonzero(~filled)[rng.integers(0, unfilled_count)]
+            palette = palette[cursor:]
+            cursor = 0
+            c0 = palette[rng.integers(0, len(palette))]
+            palette = sort_colorlist(palette, c0)
+            ptarray.set_color(p0, palette[cursor])
+        cursor += 1
+        unfilled_count -= 1
+
+        assert(unfilled_count == len(palette) - cursor)
+
+    # let's make sure that we didn't miss any spots (like the other asserts, skipped under python -O)
+    assert(ptarray.filled.all())
     
     return ptarray.create_image(width, height)
 
@@ -90,25 +96,19 @@ def randomwalk_image(imgfile:str = None, seed_point:int=None, width:int=None, he
     PIL.Image: the generated image
     """
     if imgfile is None:
-        # initialize the colorlist, which is a list of ColorClass objects
-        colorlist = []
-        for r in range(0, 32):
-            for g in range(0, 32):
-                for b in range(0, 32):
-                    color = (r * 8, g * 8, b * 8)
-                    colorlist.append(ColorClass(color))
+        # initialize the colorlist, which is an (N, 3) array of the 15-bit colors
+        colorlist = palette_15bit()
 
         # initialize the point array
-            ptarray = PointArray(nbrhood_type=NBRHOOD.CROSS)
+        ptarray = PointArray(nbrhood_type=NBRHOOD.CROSS)
     else:
         # get the source image
         image = Image.open(imgfile)
         N = image.size[0] * image.size[1]
 
-        # initialize the colorlist, which is a list of ColorClass objects
-        colors = list(image.getdata())
-        assert(len(colors) == N)
-        colorlist = [ColorClass(c) for c in colors]
+        # initialize the colorlist, which is an (N, 3) array of the image colors
+        colorlist = np.asarray(image.convert("RGB")).reshape(-1, 3)
+        assert(len(colorlist) == N)
 
         # initialize the point array
         ptarray = PointArray(image=image, nbrhood_type=NBRHOOD.CROSS)
@@ -10,8 +10,31 @@ from IPython.display import display
 from generators.genutils import *
 
 
+# GIF frames are limited to 256 colors. Rather than have PIL quantize every frame separately when
+# the gif is saved, quantize the colors once, and render every frame in "P" mode against that shared palette.
+# Index 0 is reserved for the black background. 
+# Returns the flattened rgb palette, and the palette index of each row of colors.
+def _gif_palette(colors: np.ndarray):
+    uniq, inverse = np.unique(colors, axis=0, return_inverse=True)
+    uniq_img = Image.frombytes("RGB", (len(uniq), 1), uniq.astype(np.uint8).tobytes())
+    quantized = uniq_img.quantize(colors=255)
+    # the quantizer can leave gaps in the indices it uses, so keep the palette up to the largest one
+    indices = np.asarray(quantized).ravel().astype(np.uint8)
+    gif_palette = [0, 0, 0] + quantized.getpalette()[:3 * (int(indices.max()) + 1)]
+    color_index = (indices + 1)[inverse.ravel()]
+    assert(color_index.max() < len(gif_palette) // 3)
+    return gif_palette, color_index
 
-def randomwalk(colorlist: List[ColorClass], 
+
+# render a gif frame from the palette indices of the points
+def _gif_frame(frame_index: np.ndarray, size:int, imagesize:int, gif_palette) -> Image:
+    frame = Image.frombytes("P", (size, size), frame_index.tobytes())
+    frame.putpalette(gif_palette)
+    return frame.resize((imagesize, imagesize), resample=Image.Resampling.NEAREST)
+
+
+
+def randomwalk(colorlist, 
                gifname:str, 
                *, 
                shuffle_colors=True,
@@ -25,7 +48,7 @@ def randomwalk(colorlist: List[ColorClass],
     Walks until <maxiters> or all the colors in the list are used up. Generates an animated gif as a side effect, and returns the final image.
 
     Parameters:
-    colorlist (List[generators.genutils.ColorClass]): the list of colors to use.
+    colorlist (numpy.ndarray or List[generators.genutils.ColorClass]): the colors to use, either as an (N, 3) array of rgb values or a list of ColorClass objects.
     gifname (str): the name of the animated gif file.
     shuffle_colors (boolean): If True (default), picks a random color to start, then re-sorts the colorlist by distance from the starting color. Otherwise, walks the list as given.
     size (int): the length of one side of the square that the bug walks, in pixels. Default is 128.
@@ -43,26 +66,34 @@ def randomwalk(colorlist: List[ColorClass],
     ptarray = PointArray(nbrhood_type=NBRHOOD.CROSS, image=Image.new("RGB", (size, size)))
     p0 = rng.integers(0, ptarray.converter.N)
 
+    palette = to_palette(colorlist)
     if shuffle_colors:
         # pick a random start color, then re-sort the color list to that color
-        c0 = rng.choice(colorlist)
-        colorlist = sort_colorlist(colorlist, c0) # this should put c0 at the top
+        c0 = palette[rng.integers(0, len(palette))]
+        palette = sort_colorlist(palette, c0) # this should put c0 at the top
     else:
-        c0 = colorlist[0]
+        c0 = palette[0]
+    gif_palette, color_index = _gif_palette(palette)
+    frame_index = np.zeros(ptarray.converter.N, dtype=np.uint8)
 
     if maxiters is None:
-        maxiters = len(colorlist) # run through all the colors
+        maxiters = len(palette) # run through all the colors
+    nbr_table = ptarray.nbr_table
     iters = 0
     frames = []
     imagesize = scale * size
-    while (iters < maxiters) & (len(colorlist) > 0) :
-        ptarray.aspoint(p0).color = colorlist.pop(0)
+    # iters doubles as the cursor into the palette: the next color is palette[iters]
+    while (iters < maxiters) & (iters < len(palette)) :
+        ptarray.set_color(p0, palette[iters])
+        frame_index[p0] = color_index[iters]
         if iters % 100 == 0:
-            frames.append(ptarray.create_image(imagesize, imagesize))
-        p0 = rng.choice(ptarray.aspoint(p0).nbrs)
+            frames.append(_gif_frame(frame_index, size, imagesize, gif_palette))
+        nbrs = nbr_table[p0]
+        nbrs = nbrs[nbrs >= 0]
+        p0 = nbrs[rng.integers(0, len(nbrs))]
         iters += 1
 
     # final frame
-    frames.append(ptarray.create_image(imagesize, imagesize))
+    frames.append(_gif_frame(frame_index, size, imagesize, gif_palette))
     frames[0].save(gifname, save_all=True, append_images=frames[1:], duration=100, loop=0)
-    return frames[-1]
\ No newline at end of file
+    return ptarray.create_image(imagesize, imagesize)
\ No newline at end of file